@@ -5,19 +5,27 @@ from fastapi.security import  OAuth2PasswordRequestForm
 from fastapi.security.api_key import APIKeyQuery, APIKey
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import func, update, delete, bindparam, exists
 from datetime import datetime, timedelta
+import base64
+import calendar
+import hashlib
+import hmac
+import time
 import jwt
+import orjson
 from passlib.context import CryptContext
 from json.decoder import JSONDecodeError
+from cachetools import TTLCache
 
-from database import AsyncSessionLocal, engine
-from models import Note, Base, User  # 确保导入了 User 模型
-from pydantic import BaseModel
+from database import AsyncSessionLocal
+from models import Note, User  # 确保导入了 User 模型
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional
 
 from config import API_KEY, API_KEY_NAME, SECRET_KEY
 import os
+import asyncio
 import logging
 
 # 配置日志
@@ -28,13 +36,31 @@ logging.basicConfig(filename='app.log', level=logging.INFO,
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=12, bcrypt__ident="2b", deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 current_file_path = os.path.abspath(__file__)
 current_directory = os.path.dirname(current_file_path)
 
+# 每个用户的笔记总数缓存, 避免每次翻页都执行 COUNT(*)
+_count_cache = TTLCache(maxsize=10_000, ttl=30)
+# 已验证 token 的解码结果缓存, key 为 token 的 SHA-256, 不缓存验证失败的结果
+_jwt_cache = TTLCache(maxsize=10_000, ttl=30)
+
+# 预先构建的查询语句, 避免每个请求重复构建 SQL 表达式
+_COUNT_NOTES_BY_USER = select(func.count(Note.id)).where(Note.username == bindparam("username"))
+# 基于游标 (keyset) 分页: 只取 id 小于 after_id 的记录, 避免 OFFSET 扫描
+# 列表只查询需要的列 (不包含 body), 跳过 ORM 对象的构建
+_NOTES_BY_USER = select(
+    Note.id, Note.title, Note.url, Note.category, Note.username, Note.timestamp
+).where(Note.username == bindparam("username")).order_by(Note.id.desc()).limit(bindparam("page_size"))
+_NOTES_BY_USER_AFTER = _NOTES_BY_USER.where(Note.id < bindparam("after_id"))
+_USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+_USERNAME_EXISTS = select(exists().where(User.username == bindparam("username")))
+
 
 class NoteCreate(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     title: str
     body: Optional[str] = ""
     url: Optional[str] = ""
@@ -47,6 +73,8 @@ class NoteUpdate(BaseModel):
     category: Optional[str] = None
     
 class NoteResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     title: str
     body: Optional[str] = ""
@@ -55,10 +83,19 @@ class NoteResponse(BaseModel):
     username: Optional[str] = "user1"
     timestamp: datetime
 
+# 列表接口使用, 不返回 body
+class NoteListItem(BaseModel):
+    id: int
+    title: str
+    url: Optional[str] = ""
+    category: Optional[str] = "Personal"
+    username: Optional[str] = "user1"
+    timestamp: datetime
+
 class PaginationResponse(BaseModel):
     total_pages: int
-    current_page: int
-    data: List[NoteResponse]
+    next_cursor: Optional[int] = None
+    data: List[NoteListItem]
     
 class UserCreate(BaseModel):
     username: str
@@ -70,18 +107,44 @@ class LoginRequest(BaseModel):
     
 app = FastAPI()
 
+# 数据库中取出的记录已经是可信数据, 用 model_construct 跳过重复校验
+def note_to_response(note: Note) -> NoteResponse:
+    return NoteResponse.model_construct(
+        id=note.id, title=note.title, body=note.body, url=note.url,
+        category=note.category, username=note.username, timestamp=note.timestamp,
+    )
+
+def note_to_create(note: Note) -> NoteCreate:
+    return NoteCreate.model_construct(
+        title=note.title, body=note.body, url=note.url,
+        category=note.category, username=note.username,
+    )
+
 api_key_query = APIKeyQuery(name=API_KEY_NAME, auto_error=True)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt 是纯 CPU 计算, 放到线程池执行以免阻塞事件循环
+async def get_password_hash(password):
+    return await asyncio.get_running_loop().run_in_executor(None, pwd_context.hash, password)
+async def verify_password(plain_password, hashed_password):
+    return await asyncio.get_running_loop().run_in_executor(None, pwd_context.verify, plain_password, hashed_password)
+
+def base64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
 
-# Token 创建函数
+# JWT 头部固定不变, 在导入时编码一次
+_JWT_HEADER = base64url_encode(b'{"alg":"HS256","typ":"JWT"}')
+_JWT_KEY = SECRET_KEY.encode("utf-8") if isinstance(SECRET_KEY, str) else SECRET_KEY
+
+# Token 创建函数, 手动拼接 HS256 token
+# 与 jwt.encode 一样把 datetime 类型的 exp/iat/nbf 转成整数时间戳, 否则 jwt.decode 会拒绝
 def create_access_token(data: dict):
     to_encode = data.copy()
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    for claim in ("exp", "iat", "nbf"):
+        if isinstance(to_encode.get(claim), datetime):
+            to_encode[claim] = calendar.timegm(to_encode[claim].utctimetuple())
+    signing_input = _JWT_HEADER + "." + base64url_encode(orjson.dumps(to_encode))
+    signature = hmac.new(_JWT_KEY, signing_input.encode("ascii"), hashlib.sha256).digest()
+    return signing_input + "." + base64url_encode(signature)
 
 async def get_api_key(api_key: str = Depends(api_key_query)):
     if api_key != API_KEY:
@@ -89,13 +152,21 @@ async def get_api_key(api_key: str = Depends(api_key_query)):
     return api_key
 
 
-# Token 验证依赖项
+# Token 验证依赖项 (目前还没有路由使用它)
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    key = hashlib.sha256(token.encode()).digest()
+    payload = _jwt_cache.get(key)
+    if payload is not None:
+        exp = payload.get("exp")
+        if exp is None or exp > time.time():
+            return payload["sub"]
+        _jwt_cache.pop(key, None)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        _jwt_cache[key] = payload
         return username
     except jwt.PyJWTError:
         raise HTTPException(status_code=403, detail="Could not validate credentials")
@@ -105,11 +176,6 @@ async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
 
-@app.on_event("startup")
-async def on_startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
 @app.post("/notes/", response_model=NoteResponse)
 async def create_note(request: Request, db: AsyncSession = Depends(get_db)):
     try:
@@ -131,71 +197,85 @@ async def create_note(request: Request, db: AsyncSession = Depends(get_db)):
         logging.error("An error occurred: %s", str(e))
         raise e
 
+    # id 由 lastrowid 回填, timestamp 等默认值在客户端生成, 无需再 refresh 一次
     db.add(new_note)
     await db.commit()
-    await db.refresh(new_note)
-    return NoteResponse(**new_note.__dict__)
+    _count_cache.pop(new_note.username, None)
+    return note_to_response(new_note)
 
 @app.get("/notes/", response_model=PaginationResponse)
-async def read_notes(username: str, page: int = 1, page_size: int = 10, db: AsyncSession = Depends(get_db)):
+async def read_notes(username: str, after_id: Optional[int] = None, page_size: int = 10, db: AsyncSession = Depends(get_db)):
     # 确保 page_size 至少为 1
     page_size = max(1, page_size)
 
-    total_count_query = select(func.count(Note.id)).where(Note.username == username)
-    total_count_result = await db.execute(total_count_query)
-    total_count = total_count_result.scalar_one()
+    total_count = _count_cache.get(username)
+    if total_count is None:
+        total_count_result = await db.execute(_COUNT_NOTES_BY_USER, {"username": username})
+        total_count = total_count_result.scalar_one()
+        _count_cache[username] = total_count
 
     total_pages = (total_count + page_size - 1) // page_size
-    current_page = max(1, min(page, total_pages))
 
-    skip = (current_page - 1) * page_size
+    if after_id:
+        notes_result = await db.execute(_NOTES_BY_USER_AFTER, {"username": username, "page_size": page_size, "after_id": after_id})
+    else:
+        notes_result = await db.execute(_NOTES_BY_USER, {"username": username, "page_size": page_size})
+    notes = notes_result.mappings().all()
 
-    notes_query = select(Note).where(Note.username == username).order_by(Note.id.desc()).offset(skip).limit(page_size)
-    notes_result = await db.execute(notes_query)
-    notes = notes_result.scalars().all()
+    next_cursor = notes[-1]["id"] if len(notes) == page_size else None
 
-    return PaginationResponse(total_pages=total_pages, current_page=current_page, data=[NoteResponse(**note.__dict__) for note in notes])
+    return PaginationResponse(total_pages=total_pages, next_cursor=next_cursor, data=[NoteListItem.model_construct(**note) for note in notes])
 
 
 @app.get("/notes/{note_id}", response_model=NoteCreate)
 async def read_note(note_id: int, api_key: str = Depends(get_api_key), db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Note).filter(Note.id == note_id))
-    note = result.scalar_one_or_none()
+    note = await db.get(Note, note_id)
     if note is None:
         raise HTTPException(status_code=404, detail="Note not found")
-    return NoteCreate(**note.__dict__)
+    return note_to_create(note)
 
 @app.put("/notes/{note_id}", response_model=NoteCreate)
 async def update_note(note_id: int, note_update: NoteUpdate, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Note).filter(Note.id == note_id))
-    note = result.scalar_one_or_none()
+    # 直接执行 UPDATE ... WHERE, 用匹配行数判断笔记是否存在
+    # (MySQL 不支持 UPDATE ... RETURNING, 响应数据仍需再查一次)
+    note_data = note_update.model_dump(exclude_unset=True)
+    if note_data:
+        result = await db.execute(update(Note).where(Note.id == note_id).values(**note_data))
+        if result.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Note not found")
+        await db.commit()
+    note = await db.get(Note, note_id)
     if note is None:
         raise HTTPException(status_code=404, detail="Note not found")
-    note_data = note_update.dict(exclude_unset=True)
-    for key, value in note_data.items():
-        setattr(note, key, value)
-    await db.commit()
-    await db.refresh(note)
-    return NoteCreate(**note.__dict__)
+    return note_to_create(note)
 
 @app.delete("/notes/{note_id}", response_model=NoteCreate)
 async def delete_note(note_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Note).filter(Note.id == note_id))
-    note = result.scalar_one_or_none()
+    # 支持 DELETE ... RETURNING 的数据库 (如 MariaDB) 只需一条语句, 否则先取出记录用于响应
+    if db.bind.dialect.delete_returning:
+        result = await db.execute(delete(Note).where(Note.id == note_id).returning(*Note.__table__.c))
+        note = result.one_or_none()
+        if note is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        await db.commit()
+        _count_cache.pop(note.username, None)
+        return note_to_create(note)
+    note = await db.get(Note, note_id)
     if note is None:
         raise HTTPException(status_code=404, detail="Note not found")
     await db.delete(note)
     await db.commit()
-    return NoteCreate(**note.__dict__)
+    _count_cache.pop(note.username, None)
+    return note_to_create(note)
 
 async def get_user_by_username(username: str, db: AsyncSession):
-    result = await db.execute(select(User).where(User.username == username))
+    result = await db.execute(_USER_BY_USERNAME, {"username": username})
     return result.scalar_one_or_none()
 
 @app.post("/token")
 async def login_for_access_token(login_request: LoginRequest, db: AsyncSession = Depends(get_db)):
     user = await get_user_by_username(login_request.username, db)
-    if not user or not verify_password(login_request.password, user.hashed_password):
+    if not user or not await verify_password(login_request.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(data={"sub": user.username})
@@ -203,7 +283,10 @@ async def login_for_access_token(login_request: LoginRequest, db: AsyncSession =
 
 @app.post("/register")
 async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    hashed_password = get_password_hash(user.password)
+    # 先用索引查询用户名是否已存在, 避免对重复注册白白计算 bcrypt
+    if (await db.execute(_USERNAME_EXISTS, {"username": user.username})).scalar():
+        raise HTTPException(status_code=409, detail="Username already registered")
+    hashed_password = await get_password_hash(user.password)
     new_user = User(username=user.username, hashed_password=hashed_password)
     db.add(new_user)
     await db.commit()
@@ -216,3 +299,6 @@ async def privacy_policy():
     with open(current_directory + '/privacy_policy.html', 'r') as file:
         html_content = file.read()
     return HTMLResponse(content=html_content)
+
+# 导入时先完成 bcrypt 后端的加载和检测, 避免第一次登录/注册请求承担这部分延迟
+pwd_context.hash("warmup")
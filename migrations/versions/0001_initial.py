@@ -0,0 +1,53 @@
+"""initial schema
+
+与之前 on_startup 中 create_all 创建的表结构一致,
+已有数据库可执行 `alembic stamp 0001` 后再升级.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-14
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=255), nullable=True),
+        sa.Column("body", sa.String(length=10240), nullable=True),
+        sa.Column("url", sa.String(length=255), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=True),
+        sa.Column("category", sa.String(length=255), nullable=True),
+        sa.Column("username", sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_notes_id", "notes", ["id"])
+    op.create_index("ix_notes_title", "notes", ["title"])
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("username", sa.String(length=50), nullable=True),
+        sa.Column("hashed_password", sa.String(length=255), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_table("users")
+    op.drop_index("ix_notes_title", table_name="notes")
+    op.drop_index("ix_notes_id", table_name="notes")
+    op.drop_table("notes")
@@ -0,0 +1,25 @@
+"""index notes by (username, id desc) for keyset pagination
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-14
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_notes_username_id", "notes", ["username", sa.text("id DESC")])
+    op.drop_index("ix_notes_title", table_name="notes")
+
+
+def downgrade():
+    op.create_index("ix_notes_title", "notes", ["title"])
+    op.drop_index("ix_notes_username_id", table_name="notes")
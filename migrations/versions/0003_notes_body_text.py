@@ -0,0 +1,33 @@
+"""store notes.body as TEXT instead of VARCHAR(10240)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-14
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column(
+        "notes", "body",
+        existing_type=sa.String(length=10240),
+        type_=sa.Text(),
+        existing_nullable=True,
+    )
+
+
+def downgrade():
+    op.alter_column(
+        "notes", "body",
+        existing_type=sa.Text(),
+        type_=sa.String(length=10240),
+        existing_nullable=True,
+    )
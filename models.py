@@ -1,20 +1,25 @@
-from sqlalchemy import Column, Integer, String, DateTime
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, desc
 from datetime import datetime
 
-Base = declarative_base()
+from database import Base
 
 class Note(Base):
     __tablename__ = "notes"
 
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(String(255), index=True)
-    body = Column(String(10240), default="None")
+    title = Column(String(255))
+    body = Column(Text, default="None")
     url = Column(String(255), default="")
-    timestamp = Column(DateTime, default=datetime.now)
+    # MySQL DATETIME 不保存小数秒, 默认值去掉微秒, 保证返回值与存储值一致
+    timestamp = Column(DateTime, default=lambda: datetime.now().replace(microsecond=0))
     category = Column(String(255), default="Personal")
     username = Column(String(255), default="user1")
 
+    # 支持按用户的游标分页查询: WHERE username = ? ORDER BY id DESC
+    __table_args__ = (
+        Index("ix_notes_username_id", "username", desc("id")),
+    )
+
 class User(Base):
     __tablename__ = "users"
 